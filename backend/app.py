@@ -4,22 +4,23 @@ Version avec rapports consolides
 """
 
 import os
-import shutil
+import threading
 import zipfile
 import uuid
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, HTMLResponse, JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from utils import list_python_files, read_file, write_file, get_relative_path
+from utils import iter_python_files, list_python_files, read_file, write_file, get_relative_path, clean_dir, remove_dir, purge_trash
 from analyser import analyze_file, analyze_code_string, calculate_quality_score
 from corrector import correct_code
 from generator_docstring import generate_docstrings
-from generator_rapport import generate_report_data, generate_html_report, generate_global_report
+from generator_rapport import generate_report_data, generate_html_report_to, generate_global_report_to, report_now
 from dependency_graph import analyze_file_dependencies, analyze_project_dependencies, generate_interactive_graph_html
-from llm_service import get_backend_info
+from llm_service import get_backend_info, warmup_ollama
 
 # Configuration
 BASE_DIR = Path(__file__).parent.parent
@@ -30,10 +31,24 @@ FRONTEND_DIR = BASE_DIR / "frontend"
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Au demarrage: prechargement du modele Ollama en arriere-plan et
+    nettoyage des dossiers supprimes laisses par un arret precedent.
+    """
+    threading.Thread(target=warmup_ollama, daemon=True).start()
+    for folder in (UPLOAD_DIR, OUTPUT_DIR):
+        purge_trash(str(folder))
+    yield
+
+
 app = FastAPI(
     title="AgentIA Code Standardizer",
     description="Analyse, corrige et documente automatiquement du code Python",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -54,7 +69,7 @@ async def root():
 
 @app.get("/api/status")
 async def status():
-    return {"status": "ok", "llm": get_backend_info()}
+    return {"status": "ok", "llm": dict(get_backend_info())}
 
 
 @app.post("/api/upload")
@@ -63,9 +78,7 @@ async def upload_files(files: list[UploadFile] = File(...)):
     job_id = str(uuid.uuid4())[:8]
     job_upload_dir = UPLOAD_DIR / job_id
     
-    if job_upload_dir.exists():
-        shutil.rmtree(job_upload_dir)
-    job_upload_dir.mkdir(parents=True, exist_ok=True)
+    clean_dir(str(job_upload_dir))
     
     uploaded_files = []
     
@@ -82,7 +95,7 @@ async def upload_files(files: list[UploadFile] = File(...)):
                 zip_ref.extractall(job_upload_dir)
             os.remove(zip_path)
             
-            for py_file in list_python_files(str(job_upload_dir)):
+            for py_file in iter_python_files(str(job_upload_dir)):
                 rel_path = get_relative_path(py_file, str(job_upload_dir))
                 uploaded_files.append(rel_path)
         
@@ -158,13 +171,12 @@ async def process_job(
     if not job_upload_dir.exists():
         raise HTTPException(status_code=404, detail="Job non trouve")
     
-    if job_output_dir.exists():
-        shutil.rmtree(job_output_dir)
-    job_output_dir.mkdir(parents=True, exist_ok=True)
+    clean_dir(str(job_output_dir))
     
     python_files = list_python_files(str(job_upload_dir))
     processed = []
     reports_data = []
+    report_date = report_now()  # Une seule date pour tous les rapports du job
     
     for filepath in python_files:
         relative = get_relative_path(filepath, str(job_upload_dir))
@@ -198,8 +210,8 @@ async def process_job(
             profile_data = None
             if profiling:
                 try:
-                    from profiler import profile_code
-                    profile_data = profile_code(final_code, relative)
+                    from profiler import profile_code_isolated
+                    profile_data = profile_code_isolated(final_code, relative)
                 except Exception as e:
                     print(f"[PROCESS] Erreur profiling: {e}")
             
@@ -207,15 +219,14 @@ async def process_job(
             report_data = generate_report_data(
                 filepath, original_code, final_code, 
                 has_docstrings=has_docstrings,
-                profile_data=profile_data
+                profile_data=profile_data,
+                report_date=report_date
             )
             reports_data.append(report_data)
             
-            # Generer le rapport HTML unifie
-            report_html = generate_html_report(report_data)
+            # Generer le rapport HTML unifie (ecrit directement sur disque)
             report_path = output_path.parent / (output_path.stem + "_rapport.html")
-            with open(report_path, 'w', encoding='utf-8') as f:
-                f.write(report_html)
+            generate_html_report_to(report_path, report_data)
             
             # Graphe de dependances (optionnel)
             has_graph = False
@@ -253,9 +264,7 @@ async def process_job(
             })
     
     # Rapport global
-    global_report = generate_global_report(reports_data, job_id)
-    with open(job_output_dir / "_rapport_global.html", 'w', encoding='utf-8') as f:
-        f.write(global_report)
+    generate_global_report_to(job_output_dir / "_rapport_global.html", reports_data, job_id, report_date)
     
     # Graphe projet (si plusieurs fichiers et option activee)
     if dependency_graph and len(python_files) > 1:
@@ -366,9 +375,7 @@ async def download_job(job_id: str):
 async def delete_job(job_id: str):
     """Supprime les fichiers d'un job."""
     for base_dir in [UPLOAD_DIR, OUTPUT_DIR]:
-        job_dir = base_dir / job_id
-        if job_dir.exists():
-            shutil.rmtree(job_dir)
+        remove_dir(str(base_dir / job_id))
     
     zip_path = OUTPUT_DIR / f"{job_id}_processed.zip"
     if zip_path.exists():
@@ -3,350 +3,218 @@ Generateur de rapports HTML unifies.
 Combine: analyse, documentation, profiling dans un seul fichier.
 """
 
+import heapq
+import io
+import os
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache, partial
+from html import escape
+from operator import itemgetter
 from pathlib import Path
 from analyser import analyze_file, analyze_code_string, calculate_quality_score
 
 
-def generate_report_data(filepath: str, original_code: str, corrected_code: str, 
-                         has_docstrings: bool = False, profile_data: dict = None) -> dict:
-    """
-    Genere les donnees completes du rapport pour un fichier.
-    """
-    # Analyse du fichier original
-    analysis_original = analyze_file(filepath)
-    
-    # Analyse du code corrige
-    analysis_corrected = analyze_code_string(corrected_code)
-    
-    # Scores
-    score_before = calculate_quality_score(analysis_original)
-    score_after = calculate_quality_score(analysis_corrected)
-    
-    return {
-        "filename": Path(filepath).name,
-        "filepath": filepath,
-        "date": datetime.now().strftime("%d/%m/%Y %H:%M:%S"),
-        
-        # Scores
-        "score_before": score_before,
-        "score_after": score_after,
-        "score": score_after,
-        "improvement": score_after - score_before,
-        
-        # Donnees originales
-        "original": analysis_original,
-        
-        # Donnees corrigees  
-        "corrected": analysis_corrected,
-        
-        # Code
-        "original_code": original_code,
-        "corrected_code": corrected_code,
-        
-        # Flags
-        "has_changes": original_code != corrected_code,
-        "has_docstrings": has_docstrings,
-        
-        # Profiling
-        "profile": profile_data,
-        
-        # Pour compatibilite
-        "functions": [f["name"] for f in analysis_original.get("functions", [])],
-        "classes": [c["name"] for c in analysis_original.get("classes", [])],
-        "style_issues": analysis_original.get("style_issues", []),
-        "status_color": get_score_color(score_after)
-    }
-
-
-def get_score_color(score):
-    if score >= 80:
-        return "#22c55e"
-    elif score >= 60:
-        return "#f59e0b"
-    else:
-        return "#ef4444"
+_GET_NAME = itemgetter("name")
+_GET_CUMTIME = itemgetter("cumtime")
 
+# Derniere seconde formatee: [timestamp entier, chaine formatee]
+_LAST_TS = [0, ""]
 
-def get_complexity_color(complexity):
-    if complexity <= 5:
-        return "#22c55e"
-    elif complexity <= 10:
-        return "#84cc16"
-    elif complexity <= 20:
-        return "#f59e0b"
-    else:
-        return "#ef4444"
 
+# === GABARITS DES ELEMENTS REPETES ===
+_IMPORT_ROW_TMPL = '<tr><td><code>{statement}</code></td><td>{line}</td></tr>'
 
-def generate_html_report(report_data: dict) -> str:
-    """
-    Genere un rapport HTML unifie avec toutes les sections:
-    - Scores et metriques
-    - Documentation (classes, fonctions, imports)
-    - Profiling (si disponible)
-    - Problemes de style
-    """
-    original = report_data.get("original", {})
-    profile = report_data.get("profile")
-    
-    score_before = report_data.get("score_before", 0)
-    score_after = report_data.get("score_after", 0)
-    improvement = report_data.get("improvement", 0)
-    
-    # === SECTION IMPORTS ===
-    imports = original.get("imports", [])
-    imports_html = ""
-    if imports:
-        imports_rows = ""
-        for imp in imports:
-            module = imp.get("module", "")
-            name = imp.get("name", "")
-            line = str(imp.get("line", ""))
-            if imp["type"] == "from":
-                imports_rows += "<tr><td><code>from " + module + " import " + name + "</code></td><td>" + line + "</td></tr>"
-            else:
-                imports_rows += "<tr><td><code>import " + module + "</code></td><td>" + line + "</td></tr>"
-        imports_html = """
-        <div class="section">
-            <div class="section-header" onclick="toggleSection(this)">
-                <h2>📦 Imports (""" + str(len(imports)) + """)</h2>
-                <span class="toggle">▼</span>
-            </div>
-            <div class="section-content">
-                <table><thead><tr><th>Import</th><th>Ligne</th></tr></thead>
-                <tbody>""" + imports_rows + """</tbody></table>
-            </div>
-        </div>
-        """
-    
-    # === SECTION CLASSES (DOCUMENTATION) ===
-    classes = original.get("classes", [])
-    classes_html = ""
-    if classes:
-        classes_content = ""
-        for cls in classes:
-            # Bases
-            bases_str = ""
-            if cls.get("bases"):
-                bases_str = "(" + ", ".join(cls["bases"]) + ")"
-            
-            # Docstring
-            doc_html = ""
-            if cls.get("docstring"):
-                doc_html = '<p class="docstring">' + cls["docstring"].replace('\n', '<br>') + '</p>'
-            
-            # Attributs
-            attrs_html = ""
-            if cls.get("attributes"):
-                attrs_html = '<div class="attrs"><strong>Attributs:</strong> ' + ", ".join(cls["attributes"]) + '</div>'
-            
-            # Methodes
-            methods_html = ""
-            for m in cls.get("methods", []):
-                complexity = m.get("complexity", 1)
-                c_color = get_complexity_color(complexity)
-                doc_icon = "✓" if m.get("has_docstring") else "✗"
-                doc_color = "#22c55e" if m.get("has_docstring") else "#ef4444"
-                args_str = ", ".join(m.get("args", []))
-                
-                methods_html += """
+_METHOD_ITEM_TMPL = """
                 <div class="method">
-                    <code>""" + m["name"] + """(""" + args_str + """)</code>
-                    <span class="badge" style="background:""" + c_color + """">C:""" + str(complexity) + """</span>
-                    <span style="color:""" + doc_color + """">""" + doc_icon + """</span>
+                    <code>{name}({args})</code>
+                    <span class="badge" style="background:{color}">C:{complexity}</span>
+                    <span style="color:{doc_color}">{doc_icon}</span>
                 </div>
                 """
-            
-            doc_badge = '<span class="badge badge-green">Doc ✓</span>' if cls.get("has_docstring") else '<span class="badge badge-gray">Doc ✗</span>'
-            
-            classes_content += """
+
+# Les methodes sont ecrites directement entre l'entete et la fin de carte
+_CLASS_CARD_HEAD_TMPL = """
             <div class="class-card">
                 <div class="class-header">
-                    <h3>class """ + cls["name"] + bases_str + """</h3>
-                    """ + doc_badge + """
-                    <span class="line-info">L.""" + str(cls.get("line", "")) + """</span>
+                    <h3>class {name}{bases}</h3>
+                    {doc_badge}
+                    <span class="line-info">L.{line}</span>
                 </div>
-                """ + doc_html + """
-                """ + attrs_html + """
-                <div class="methods">""" + methods_html + """</div>
+                {doc_html}
+                {attrs_html}
+                <div class="methods">"""
+
+_CLASS_CARD_END = """</div>
             </div>
             """
-        
-        classes_html = """
-        <div class="section">
-            <div class="section-header" onclick="toggleSection(this)">
-                <h2>🏗️ Classes (""" + str(len(classes)) + """)</h2>
-                <span class="toggle">▼</span>
-            </div>
-            <div class="section-content">""" + classes_content + """</div>
-        </div>
-        """
-    
-    # === SECTION FONCTIONS (DOCUMENTATION) ===
-    functions = original.get("functions", [])
-    functions_html = ""
-    if functions:
-        func_rows = ""
-        for func in functions:
-            complexity = func.get("complexity", 1)
-            c_color = get_complexity_color(complexity)
-            doc_icon = "✓" if func.get("has_docstring") else "✗"
-            doc_color = "#22c55e" if func.get("has_docstring") else "#ef4444"
-            
-            args_list = func.get("args", [])
-            args_str = ", ".join([a["name"] + (": " + a.get("type", "") if a.get("type") else "") for a in args_list])
-            return_type = func.get("return_type") or "-"
-            
-            # Docstring tooltip
-            doc_preview = ""
-            if func.get("docstring"):
-                doc_preview = func["docstring"][:100].replace('"', "'")
-            
-            func_rows += """
-            <tr title=\"""" + doc_preview + """\">
-                <td><code>""" + func["name"] + """</code></td>
-                <td class="args">""" + args_str + """</td>
-                <td>""" + return_type + """</td>
-                <td><span class="badge" style="background:""" + c_color + """">""" + str(complexity) + """</span></td>
-                <td style="color:""" + doc_color + """">""" + doc_icon + """</td>
-                <td>""" + str(func.get("lines", 0)) + """</td>
+
+_FUNC_ROW_TMPL = """
+            <tr title="{doc_preview}">
+                <td><code>{name}</code></td>
+                <td class="args">{args}</td>
+                <td>{return_type}</td>
+                <td><span class="badge" style="background:{color}">{complexity}</span></td>
+                <td style="color:{doc_color}">{doc_icon}</td>
+                <td>{lines}</td>
             </tr>
             """
-        
-        functions_html = """
-        <div class="section">
-            <div class="section-header" onclick="toggleSection(this)">
-                <h2>⚡ Fonctions (""" + str(len(functions)) + """)</h2>
-                <span class="toggle">▼</span>
-            </div>
-            <div class="section-content">
-                <table>
-                    <thead><tr><th>Nom</th><th>Arguments</th><th>Retour</th><th>Complexite</th><th>Doc</th><th>Lignes</th></tr></thead>
-                    <tbody>""" + func_rows + """</tbody>
-                </table>
-            </div>
-        </div>
-        """
-    
-    # === SECTION VARIABLES ===
-    variables = original.get("variables", [])
-    constants = original.get("constants", [])
-    vars_html = ""
-    if variables or constants:
-        var_items = ""
-        for v in constants:
-            var_items += '<div class="var const"><code>' + v["name"] + '</code> = ' + str(v.get("value", ""))[:30] + '</div>'
-        for v in variables:
-            if not v.get("is_constant"):
-                var_items += '<div class="var"><code>' + v["name"] + '</code> <span class="type">' + v.get("type", "")[:20] + '</span></div>'
-        
-        vars_html = """
-        <div class="section">
-            <div class="section-header" onclick="toggleSection(this)">
-                <h2>📊 Variables Globales (""" + str(len(variables) + len(constants)) + """)</h2>
-                <span class="toggle">▼</span>
-            </div>
-            <div class="section-content">
-                <div class="vars-grid">""" + var_items + """</div>
-            </div>
-        </div>
-        """
-    
-    # === SECTION PROFILING ===
-    profile_html = ""
-    if profile and profile.get("functions"):
-        profile_funcs = profile.get("functions", [])[:15]
-        total_time = profile.get("total_time", 0.001)
-        
-        profile_rows = ""
-        for pf in profile_funcs:
-            pct = (pf["cumtime"] / total_time * 100) if total_time > 0 else 0
-            color = "#22c55e" if pct < 10 else "#f59e0b" if pct < 30 else "#ef4444"
-            bar_width = min(100, pct * 2)
-            
-            profile_rows += """
+
+_CONST_ITEM_TMPL = '<div class="var const"><code>{name}</code> = {value}</div>'
+
+_VAR_ITEM_TMPL = '<div class="var"><code>{name}</code> <span class="type">{type}</span></div>'
+
+_ISSUE_ITEM_TMPL = '<div class="issue">{issue}</div>'
+
+_PROFILE_ROW_TMPL = """
             <tr>
-                <td><code>""" + pf["name"] + """</code></td>
-                <td>""" + str(pf["ncalls"]) + """</td>
-                <td>""" + str(round(pf["cumtime"] * 1000, 2)) + """ms</td>
+                <td><code>{name}</code></td>
+                <td>{ncalls}</td>
+                <td>{ms:.2f}ms</td>
                 <td>
                     <div class="bar-container">
-                        <div class="bar" style="width:""" + str(bar_width) + """%;background:""" + color + """"></div>
-                        <span>""" + str(round(pct, 1)) + """%</span>
+                        <div class="bar" style="width:{bar:.1f}%;background:{color}"></div>
+                        <span>{pct:.1f}%</span>
                     </div>
                 </td>
             </tr>
             """
-        
-        profile_html = """
-        <div class="section">
-            <div class="section-header" onclick="toggleSection(this)">
-                <h2>⏱️ Profiling (""" + str(round(total_time * 1000, 2)) + """ms total)</h2>
-                <span class="toggle">▼</span>
-            </div>
-            <div class="section-content">
-                <table>
-                    <thead><tr><th>Fonction</th><th>Appels</th><th>Temps</th><th>% du total</th></tr></thead>
-                    <tbody>""" + profile_rows + """</tbody>
-                </table>
-            </div>
-        </div>
+
+_FILE_ROW_TMPL = """
+        <tr>
+            <td><code>{filename}</code></td>
+            <td>{score_before}</td>
+            <td style="color:{score_color};font-weight:600">{score_after}</td>
+            <td style="color:{imp_color}">{imp_text}</td>
+            <td>{functions}</td>
+            <td>{classes}</td>
+            <td>{issues}</td>
+        </tr>
         """
-    
-    # === SECTION PROBLEMES ===
-    style_issues = original.get("style_issues", [])
-    issues_html = ""
-    if style_issues:
-        issues_list = ""
-        for issue in style_issues[:25]:
-            issues_list += '<div class="issue">' + str(issue) + '</div>'
-        more_text = ""
-        if len(style_issues) > 25:
-            more_text = '<p class="more">... et ' + str(len(style_issues) - 25) + ' autres problemes</p>'
-        
-        issues_html = """
-        <div class="section">
-            <div class="section-header" onclick="toggleSection(this)">
-                <h2>⚠️ Problemes de Style (""" + str(len(style_issues)) + """)</h2>
-                <span class="toggle">▼</span>
+
+
+# === BADGES ET STYLES CONSTANTS ===
+# Indexes par bool(...): (faux, vrai)
+_PEP8_BADGES = (
+    '<span class="status-badge gray">Deja conforme</span>',
+    '<span class="status-badge green">PEP8 ✓</span>',
+)
+_DOC_BADGES = (
+    '<span class="status-badge gray">Sans docstrings IA</span>',
+    '<span class="status-badge green">Docstrings IA ✓</span>',
+)
+
+# Seuils des couleurs: score >= 60 / >= 80, complexite <= 5 / <= 10 / <= 20
+_SCORE_THRESHOLDS = (60, 80)
+_SCORE_COLORS = ("#ef4444", "#f59e0b", "#22c55e")
+_COMPLEXITY_THRESHOLDS = (5, 10, 20)
+_COMPLEXITY_COLORS = ("#22c55e", "#84cc16", "#f59e0b", "#ef4444")
+
+# Signe de l'amelioration -> (format du texte, fond, couleur)
+_IMPROVEMENT_STYLES = {
+    1: ("+{}", "#dcfce7", "#166534"),
+    0: ("=", "#f1f5f9", "#64748b"),
+    -1: ("{}", "#fef2f2", "#991b1b"),
+}
+
+# Rapport reduit pour un fichier sans element a detailler (ni classe,
+# fonction, import, variable, profil ou probleme de style)
+_MINIMAL_REPORT_OPEN_TMPL = """<!DOCTYPE html>
+<html lang="fr">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Rapport - {filename}</title>
+    <style>
+"""
+
+_MINIMAL_REPORT_CSS = """        * { margin: 0; padding: 0; box-sizing: border-box; }
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
+            background: #f1f5f9;
+            color: #1e293b;
+            line-height: 1.6;
+        }
+        .container { max-width: 1000px; margin: 0 auto; padding: 20px; }
+        .header {
+            background: linear-gradient(135deg, #1e3a5f 0%, #0f172a 100%);
+            color: white;
+            padding: 32px;
+            border-radius: 16px 16px 0 0;
+        }
+        .header h1 { font-size: 24px; margin-bottom: 6px; }
+        .header p { opacity: 0.7; font-size: 13px; }
+        .scores { display: flex; background: white; border-bottom: 1px solid #e2e8f0; }
+        .score-box { flex: 1; padding: 24px; text-align: center; border-right: 1px solid #e2e8f0; }
+        .score-box:last-child { border-right: none; }
+        .score-value { font-size: 36px; font-weight: 700; }
+        .score-label { font-size: 12px; color: #64748b; margin-top: 4px; }
+        .status-bar { display: flex; gap: 10px; padding: 16px 20px; background: white; border-bottom: 1px solid #e2e8f0; }
+        .status-badge { padding: 6px 14px; border-radius: 20px; font-size: 12px; font-weight: 500; }
+        .status-badge.green { background: #dcfce7; color: #166534; }
+        .status-badge.gray { background: #f1f5f9; color: #64748b; }
+        .empty {
+            background: white;
+            padding: 20px;
+            text-align: center;
+            font-size: 13px;
+            color: #64748b;
+            border-radius: 0 0 16px 16px;
+            box-shadow: 0 4px 20px rgba(0,0,0,0.06);
+        }
+        .footer { text-align: center; padding: 20px; color: #94a3b8; font-size: 11px; }
+"""
+
+_MINIMAL_REPORT_BODY_TMPL = """    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>📄 {filename}</h1>
+            <p>Rapport genere le {date}</p>
+        </div>
+        <div class="scores">
+            <div class="score-box" style="border-top: 4px solid {before_color}">
+                <div class="score-value" style="color:{before_color}">{score_before}</div>
+                <div class="score-label">Score Avant</div>
             </div>
-            <div class="section-content">
-                """ + issues_list + more_text + """
+            <div class="score-box" style="border-top: 4px solid {after_color}">
+                <div class="score-value" style="color:{after_color}">{score_after}</div>
+                <div class="score-label">Score Apres</div>
+            </div>
+            <div class="score-box" style="border-top: 4px solid {imp_color}; background: {imp_bg}">
+                <div class="score-value" style="color:{imp_color}">{imp_text}</div>
+                <div class="score-label">Amelioration</div>
             </div>
         </div>
-        """
-    
-    # === COULEURS SCORES ===
-    before_color = get_score_color(score_before)
-    after_color = get_score_color(score_after)
-    
-    if improvement > 0:
-        imp_text = "+" + str(improvement)
-        imp_bg = "#dcfce7"
-        imp_color = "#166534"
-    elif improvement == 0:
-        imp_text = "="
-        imp_bg = "#f1f5f9"
-        imp_color = "#64748b"
-    else:
-        imp_text = str(improvement)
-        imp_bg = "#fef2f2"
-        imp_color = "#991b1b"
-    
-    # === BADGES STATUT ===
-    pep8_badge = '<span class="status-badge green">PEP8 ✓</span>' if report_data.get("has_changes") else '<span class="status-badge gray">Deja conforme</span>'
-    doc_badge = '<span class="status-badge green">Docstrings IA ✓</span>' if report_data.get("has_docstrings") else '<span class="status-badge gray">Sans docstrings IA</span>'
-    
-    # === HTML FINAL ===
-    html = """<!DOCTYPE html>
+        <div class="status-bar">
+            {pep8_badge}
+            {doc_badge}
+        </div>
+        <div class="empty">{message}</div>
+        <div class="footer">
+            Rapport genere par AgentIA Code Standardizer
+        </div>
+    </div>
+</body>
+</html>"""
+
+
+# === SQUELETTES DES RAPPORTS ===
+# Chaque page = ouverture (<title>) + feuille de style statique ecrite telle
+# quelle + corps passe a format_map (accolades CSS doublees dans ce dernier).
+_REPORT_OPEN_TMPL = """<!DOCTYPE html>
 <html lang="fr">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Rapport - """ + report_data["filename"] + """</title>
+    <title>Rapport - {filename}</title>
     <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
+"""
+
+_REPORT_CSS = """        * { margin: 0; padding: 0; box-sizing: border-box; }
         body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
             background: #f1f5f9;
@@ -377,13 +245,7 @@ def generate_html_report(report_data: dict) -> str:
             border-right: 1px solid #e2e8f0;
         }
         .score-box:last-child { border-right: none; }
-        .score-box.before { border-top: 4px solid """ + before_color + """; }
-        .score-box.after { border-top: 4px solid """ + after_color + """; }
-        .score-box.imp { border-top: 4px solid """ + imp_color + """; background: """ + imp_bg + """; }
         .score-value { font-size: 36px; font-weight: 700; }
-        .score-box.before .score-value { color: """ + before_color + """; }
-        .score-box.after .score-value { color: """ + after_color + """; }
-        .score-box.imp .score-value { color: """ + imp_color + """; }
         .score-label { font-size: 12px; color: #64748b; margin-top: 4px; }
         
         .metrics {
@@ -555,69 +417,74 @@ def generate_html_report(report_data: dict) -> str:
             color: #94a3b8;
             font-size: 11px;
         }
+"""
+
+# Regles de couleur des scores (dependent du rapport) puis entete de page
+_REPORT_HEAD_TMPL = """        .score-box.before {{ border-top: 4px solid {before_color}; }}
+        .score-box.after {{ border-top: 4px solid {after_color}; }}
+        .score-box.imp {{ border-top: 4px solid {imp_color}; background: {imp_bg}; }}
+        .score-box.before .score-value {{ color: {before_color}; }}
+        .score-box.after .score-value {{ color: {after_color}; }}
+        .score-box.imp .score-value {{ color: {imp_color}; }}
     </style>
 </head>
 <body>
     <div class="container">
         <div class="header">
-            <h1>📄 """ + report_data["filename"] + """</h1>
-            <p>Rapport genere le """ + report_data["date"] + """</p>
+            <h1>📄 {filename}</h1>
+            <p>Rapport genere le {date}</p>
         </div>
         
         <div class="scores">
             <div class="score-box before">
-                <div class="score-value">""" + str(score_before) + """</div>
+                <div class="score-value">{score_before}</div>
                 <div class="score-label">Score Avant</div>
             </div>
             <div class="score-box after">
-                <div class="score-value">""" + str(score_after) + """</div>
+                <div class="score-value">{score_after}</div>
                 <div class="score-label">Score Apres</div>
             </div>
             <div class="score-box imp">
-                <div class="score-value">""" + imp_text + """</div>
+                <div class="score-value">{imp_text}</div>
                 <div class="score-label">Amelioration</div>
             </div>
         </div>
         
         <div class="metrics">
             <div class="metric">
-                <div class="metric-value">""" + str(original.get("lines", 0)) + """</div>
+                <div class="metric-value">{lines}</div>
                 <div class="metric-label">Lignes</div>
             </div>
             <div class="metric">
-                <div class="metric-value">""" + str(original.get("code_lines", 0)) + """</div>
+                <div class="metric-value">{code_lines}</div>
                 <div class="metric-label">Code</div>
             </div>
             <div class="metric">
-                <div class="metric-value">""" + str(len(functions)) + """</div>
+                <div class="metric-value">{n_functions}</div>
                 <div class="metric-label">Fonctions</div>
             </div>
             <div class="metric">
-                <div class="metric-value">""" + str(len(classes)) + """</div>
+                <div class="metric-value">{n_classes}</div>
                 <div class="metric-label">Classes</div>
             </div>
             <div class="metric">
-                <div class="metric-value">""" + str(original.get("avg_complexity", 0)) + """</div>
+                <div class="metric-value">{avg_complexity}</div>
                 <div class="metric-label">Complexite</div>
             </div>
             <div class="metric">
-                <div class="metric-value">""" + str(original.get("doc_coverage", 0)) + """%</div>
+                <div class="metric-value">{doc_coverage}%</div>
                 <div class="metric-label">Doc</div>
             </div>
         </div>
         
         <div class="status-bar">
-            """ + pep8_badge + """
-            """ + doc_badge + """
+            {pep8_badge}
+            {doc_badge}
         </div>
         
-        <div class="content">
-            """ + classes_html + """
-            """ + functions_html + """
-            """ + imports_html + """
-            """ + vars_html + """
-            """ + profile_html + """
-            """ + issues_html + """
+        <div class="content">"""
+
+_REPORT_FOOTER = """
         </div>
         
         <div class="footer">
@@ -632,53 +499,43 @@ def generate_html_report(report_data: dict) -> str:
     </script>
 </body>
 </html>"""
-    
-    return html
 
+_SECTION_HEAD_TMPL = """
+        <div class="section">
+            <div class="section-header" onclick="toggleSection(this)">
+                <h2>{title} ({count})</h2>
+                <span class="toggle">▼</span>
+            </div>
+            <div class="section-content">"""
 
-def generate_global_report(files_data: list, job_id: str) -> str:
-    """Genere un rapport global pour tous les fichiers."""
-    
-    total_files = len(files_data)
-    if total_files == 0:
-        return "<html><body>Aucun fichier</body></html>"
-    
-    total_functions = sum(len(f.get("functions", [])) for f in files_data)
-    total_classes = sum(len(f.get("classes", [])) for f in files_data)
-    total_issues = sum(len(f.get("style_issues", [])) for f in files_data)
-    avg_score = sum(f.get("score", 0) for f in files_data) // total_files
-    avg_improvement = sum(f.get("improvement", 0) for f in files_data) // total_files
-    
-    files_rows = ""
-    for f in files_data:
-        score_before = f.get("score_before", 0)
-        score_after = f.get("score_after", 0)
-        improvement = f.get("improvement", 0)
-        
-        imp_color = "#22c55e" if improvement > 0 else "#64748b"
-        imp_text = "+" + str(improvement) if improvement > 0 else str(improvement)
-        
-        files_rows += """
-        <tr>
-            <td><code>""" + f.get("filename", "") + """</code></td>
-            <td>""" + str(score_before) + """</td>
-            <td style="color:""" + get_score_color(score_after) + """;font-weight:600">""" + str(score_after) + """</td>
-            <td style="color:""" + imp_color + """">""" + imp_text + """</td>
-            <td>""" + str(len(f.get("functions", []))) + """</td>
-            <td>""" + str(len(f.get("classes", []))) + """</td>
-            <td>""" + str(len(f.get("style_issues", []))) + """</td>
-        </tr>
+_SECTION_END = """
+            </div>
+        </div>
         """
-    
-    current_date = datetime.now().strftime("%d/%m/%Y %H:%M:%S")
-    
-    return """<!DOCTYPE html>
+
+_TABLE_HEAD_TMPL = """
+                <table>
+                    <thead><tr>{columns}</tr></thead>
+                    <tbody>"""
+
+_FUNC_TABLE_HEAD = _TABLE_HEAD_TMPL.format(
+    columns="<th>Nom</th><th>Arguments</th><th>Retour</th><th>Complexite</th><th>Doc</th><th>Lignes</th>")
+_IMPORT_TABLE_HEAD = _TABLE_HEAD_TMPL.format(columns="<th>Import</th><th>Ligne</th>")
+_PROFILE_TABLE_HEAD = _TABLE_HEAD_TMPL.format(
+    columns="<th>Fonction</th><th>Appels</th><th>Temps</th><th>% du total</th>")
+
+_TABLE_SECTION_END = """</tbody>
+                </table>""" + _SECTION_END
+
+_GLOBAL_OPEN_TMPL = """<!DOCTYPE html>
 <html lang="fr">
 <head>
     <meta charset="UTF-8">
-    <title>Rapport Global - Job """ + job_id + """</title>
+    <title>Rapport Global - Job {job_id}</title>
     <style>
-        * { margin: 0; padding: 0; box-sizing: border-box; }
+"""
+
+_GLOBAL_CSS = """        * { margin: 0; padding: 0; box-sizing: border-box; }
         body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
             background: #f1f5f9;
@@ -720,33 +577,35 @@ def generate_global_report(files_data: list, job_id: str) -> str:
         td { font-size: 13px; }
         code { background: #f1f5f9; padding: 4px 8px; border-radius: 4px; }
         .footer { text-align: center; padding: 20px; color: #94a3b8; font-size: 11px; }
-    </style>
+"""
+
+_GLOBAL_HEAD_TMPL = """    </style>
 </head>
 <body>
     <div class="container">
         <div class="header">
             <h1>📊 Rapport Global</h1>
-            <p>Job """ + job_id + """ - """ + current_date + """</p>
+            <p>Job {job_id} - {date}</p>
         </div>
         <div class="stats">
             <div class="stat">
-                <div class="stat-value">""" + str(avg_score) + """</div>
+                <div class="stat-value">{avg_score}</div>
                 <div class="stat-label">Score moyen</div>
             </div>
             <div class="stat">
-                <div class="stat-value" style="color:#22c55e">+""" + str(avg_improvement) + """</div>
+                <div class="stat-value" style="color:#22c55e">+{avg_improvement}</div>
                 <div class="stat-label">Amelioration moy.</div>
             </div>
             <div class="stat">
-                <div class="stat-value">""" + str(total_files) + """</div>
+                <div class="stat-value">{total_files}</div>
                 <div class="stat-label">Fichiers</div>
             </div>
             <div class="stat">
-                <div class="stat-value">""" + str(total_functions) + """</div>
+                <div class="stat-value">{total_functions}</div>
                 <div class="stat-label">Fonctions</div>
             </div>
             <div class="stat">
-                <div class="stat-value">""" + str(total_classes) + """</div>
+                <div class="stat-value">{total_classes}</div>
                 <div class="stat-label">Classes</div>
             </div>
         </div>
@@ -756,10 +615,481 @@ def generate_global_report(files_data: list, job_id: str) -> str:
                 <thead>
                     <tr><th>Fichier</th><th>Avant</th><th>Apres</th><th>+/-</th><th>Fonctions</th><th>Classes</th><th>Problemes</th></tr>
                 </thead>
-                <tbody>""" + files_rows + """</tbody>
+                <tbody>"""
+
+_GLOBAL_FOOTER = """</tbody>
             </table>
         </div>
         <div class="footer">AgentIA Code Standardizer</div>
     </div>
 </body>
-</html>"""
\ No newline at end of file
+</html>"""
+
+
+def generate_report_data(filepath: str, original_code: str, corrected_code: str, 
+                         has_docstrings: bool = False, profile_data: dict = None,
+                         report_date: str = None) -> dict:
+    """
+    Genere les donnees completes du rapport pour un fichier.
+    `report_date` (voir report_now) permet de partager la date d'un lot.
+    """
+    # Analyse du fichier original (memoisee tant que le fichier ne change pas)
+    try:
+        st = os.stat(filepath)
+        analysis_original = _cached_analyze_file(filepath, st.st_mtime_ns, st.st_size)
+    except OSError:
+        analysis_original = analyze_file(filepath)
+    
+    # Analyse du code corrige
+    analysis_corrected = _cached_analyze_code(corrected_code)
+    
+    # Scores
+    score_before = calculate_quality_score(analysis_original)
+    score_after = calculate_quality_score(analysis_corrected)
+    
+    return {
+        "filename": Path(filepath).name,
+        "filepath": filepath,
+        "date": report_date or report_now(),
+        
+        # Scores
+        "score_before": score_before,
+        "score_after": score_after,
+        "score": score_after,
+        "improvement": score_after - score_before,
+        
+        # Donnees originales
+        "original": analysis_original,
+        
+        # Donnees corrigees  
+        "corrected": analysis_corrected,
+        
+        # Code
+        "original_code": original_code,
+        "corrected_code": corrected_code,
+        
+        # Flags
+        "has_changes": original_code != corrected_code,
+        "has_docstrings": has_docstrings,
+        
+        # Profiling
+        "profile": profile_data,
+        
+        # Pour compatibilite
+        "functions": list(map(_GET_NAME, analysis_original.get("functions", []))),
+        "classes": list(map(_GET_NAME, analysis_original.get("classes", []))),
+        "style_issues": analysis_original.get("style_issues", []),
+        "status_color": get_score_color(score_after)
+    }
+
+
+@lru_cache(maxsize=256)
+def _cached_analyze_file(filepath: str, mtime_ns: int, size: int) -> dict:
+    """Analyse d'un fichier, memoisee par (chemin, date de modification, taille)."""
+    return analyze_file(filepath)
+
+
+@lru_cache(maxsize=64)
+def _cached_analyze_code(code: str) -> dict:
+    """Analyse d'un code source, memoisee par contenu."""
+    return analyze_code_string(code)
+
+
+def report_now() -> str:
+    """Date courante formatee, recalculee au plus une fois par seconde."""
+    t = int(time.time())
+    if t != _LAST_TS[0]:
+        _LAST_TS[0] = t
+        _LAST_TS[1] = datetime.fromtimestamp(t).strftime("%d/%m/%Y %H:%M:%S")
+    return _LAST_TS[1]
+
+
+def _trunc(s: str, n: int) -> str:
+    """Tronque `s` a `n` caracteres sans copie si elle est deja assez courte."""
+    return s if len(s) <= n else s[:n]
+
+
+def get_score_color(score):
+    return _SCORE_COLORS[bisect_right(_SCORE_THRESHOLDS, score)]
+
+
+def get_complexity_color(complexity):
+    return _COMPLEXITY_COLORS[bisect_left(_COMPLEXITY_THRESHOLDS, complexity)]
+
+
+def _render_import_row(imp: dict) -> str:
+    """Ligne <tr> d'un import."""
+    if imp["type"] == "from":
+        statement = f"from {imp.get('module', '')} import {imp.get('name', '')}"
+    else:
+        statement = f"import {imp.get('module', '')}"
+    return _IMPORT_ROW_TMPL.format_map({"statement": escape(statement), "line": imp.get("line", "")})
+
+
+def _render_method_item(m: dict) -> str:
+    """Ligne d'une methode dans la carte de sa classe."""
+    _mget = m.get
+    complexity = _mget("complexity", 1)
+    has_doc = _mget("has_docstring")
+    return _METHOD_ITEM_TMPL.format_map({
+        "name": escape(m["name"]),
+        "args": escape(", ".join(_mget("args", []))),
+        "color": get_complexity_color(complexity),
+        "complexity": complexity,
+        "doc_color": "#22c55e" if has_doc else "#ef4444",
+        "doc_icon": "✓" if has_doc else "✗",
+    })
+
+
+def _render_class_card_head(cls: dict) -> str:
+    """Entete de la carte d'une classe (nom, docstring, attributs)."""
+    _cget = cls.get
+    
+    # Bases
+    bases_str = ""
+    bases = _cget("bases")
+    if bases:
+        bases_str = f"({escape(', '.join(bases))})"
+    
+    # Docstring
+    doc_html = ""
+    docstring = _cget("docstring")
+    if docstring:
+        doc = escape(docstring).replace("\n", "<br>")
+        doc_html = f'<p class="docstring">{doc}</p>'
+    
+    # Attributs
+    attrs_html = ""
+    attributes = _cget("attributes")
+    if attributes:
+        attrs_html = f'<div class="attrs"><strong>Attributs:</strong> {escape(", ".join(attributes))}</div>'
+    
+    class_badge = '<span class="badge badge-green">Doc ✓</span>' if _cget("has_docstring") else '<span class="badge badge-gray">Doc ✗</span>'
+    
+    return _CLASS_CARD_HEAD_TMPL.format_map({
+        "name": escape(cls["name"]),
+        "bases": bases_str,
+        "doc_badge": class_badge,
+        "line": cls.get("line", ""),
+        "doc_html": doc_html,
+        "attrs_html": attrs_html,
+    })
+
+
+def _render_func_row(func: dict) -> str:
+    """Ligne <tr> d'une fonction du module."""
+    _fget = func.get
+    complexity = _fget("complexity", 1)
+    has_doc = _fget("has_docstring")
+    
+    args_list = _fget("args", [])
+    args_str = ", ".join([f"{a['name']}: {a['type']}" if a.get("type") else a["name"] for a in args_list])
+    return_type = _fget("return_type") or "-"
+    
+    # Docstring tooltip
+    doc_preview = ""
+    docstring = _fget("docstring")
+    if docstring:
+        doc_preview = escape(docstring[:100])
+    
+    return _FUNC_ROW_TMPL.format_map({
+        "doc_preview": doc_preview,
+        "name": escape(func["name"]),
+        "args": escape(args_str),
+        "return_type": escape(return_type),
+        "color": get_complexity_color(complexity),
+        "complexity": complexity,
+        "doc_color": "#22c55e" if has_doc else "#ef4444",
+        "doc_icon": "✓" if has_doc else "✗",
+        "lines": _fget("lines", 0),
+    })
+
+
+def _render_const_item(v: dict) -> str:
+    """Element de la grille pour une constante."""
+    return _CONST_ITEM_TMPL.format_map({"name": escape(v["name"]), "value": escape(_trunc(v.get("value", ""), 30))})
+
+
+def _render_var_item(v: dict) -> str:
+    """Element de la grille pour une variable globale."""
+    return _VAR_ITEM_TMPL.format_map({"name": escape(v["name"]), "type": escape(_trunc(v.get("type", ""), 20))})
+
+
+def _render_profile_row(pf: dict, inv_total: float) -> str:
+    """Ligne <tr> d'une fonction profilee; `inv_total` vaut 100 / temps total."""
+    ct = pf["cumtime"]
+    pct = ct * inv_total
+    return _PROFILE_ROW_TMPL.format_map({
+        "name": escape(pf["name"]),
+        "ncalls": pf["ncalls"],
+        "ms": ct * 1000,
+        "bar": min(100.0, pct * 2),
+        "color": "#22c55e" if pct < 10 else "#f59e0b" if pct < 30 else "#ef4444",
+        "pct": pct,
+    })
+
+
+def _render_file_row(f: dict) -> str:
+    """Ligne <tr> d'un fichier dans le rapport global."""
+    score_after = f["score_after"]
+    improvement = f["improvement"]
+    
+    return _FILE_ROW_TMPL.format_map({
+        "filename": escape(f["filename"]),
+        "score_before": f["score_before"],
+        "score_color": get_score_color(score_after),
+        "score_after": score_after,
+        "imp_color": "#22c55e" if improvement > 0 else "#64748b",
+        "imp_text": f"+{improvement}" if improvement > 0 else f"{improvement}",
+        "functions": len(f["functions"]),
+        "classes": len(f["classes"]),
+        "issues": len(f["style_issues"]),
+    })
+
+
+def write_html_report(report_data: dict, out) -> None:
+    """
+    Ecrit le rapport HTML unifie section par section dans `out`
+    (tout objet fichier disposant d'une methode write):
+    - Scores et metriques
+    - Documentation (classes, fonctions, imports)
+    - Profiling (si disponible)
+    - Problemes de style
+    """
+    # Cles toujours presentes (generate_report_data); l'analyse peut etre partielle
+    original = report_data["original"]
+    _og = original.get
+    profile = report_data["profile"]
+    write = out.write
+    writelines = out.writelines
+    
+    score_before = report_data["score_before"]
+    score_after = report_data["score_after"]
+    improvement = report_data["improvement"]
+    
+    imports = _og("imports", [])
+    classes = _og("classes", [])
+    functions = _og("functions", [])
+    variables = _og("variables", [])
+    constants = _og("constants", [])
+    style_issues = _og("style_issues", [])
+    
+    # === COULEURS SCORES ===
+    before_color = get_score_color(score_before)
+    after_color = get_score_color(score_after)
+    
+    imp_fmt, imp_bg, imp_color = _IMPROVEMENT_STYLES[(improvement > 0) - (improvement < 0)]
+    imp_text = imp_fmt.format(improvement)
+    
+    # === BADGES STATUT ===
+    pep8_badge = _PEP8_BADGES[report_data["has_changes"]]
+    doc_badge = _DOC_BADGES[bool(report_data["has_docstrings"])]
+    
+    # === RAPPORT REDUIT (rien a detailler, ou fichier inchange sans profil) ===
+    has_profile = bool(profile and profile.get("functions"))
+    if not (imports or classes or functions or variables or constants or style_issues or has_profile):
+        message = "Aucune classe, fonction, import ou variable a documenter."
+    elif not (report_data["has_changes"] or report_data["has_docstrings"] or has_profile or style_issues):
+        # Les problemes restants (non corriges par autopep8) et les docstrings
+        # demandees gardent le rapport complet: le message ne contredit pas le badge
+        message = "Fichier inchange: aucune correction ni docstring n'a ete appliquee."
+    else:
+        message = None
+    if message:
+        filename = escape(report_data["filename"])
+        write(_MINIMAL_REPORT_OPEN_TMPL.format_map({"filename": filename}))
+        write(_MINIMAL_REPORT_CSS)
+        write(_MINIMAL_REPORT_BODY_TMPL.format_map({
+            "filename": filename,
+            "date": report_data["date"],
+            "score_before": score_before,
+            "score_after": score_after,
+            "before_color": before_color,
+            "after_color": after_color,
+            "imp_text": imp_text,
+            "imp_bg": imp_bg,
+            "imp_color": imp_color,
+            "pep8_badge": pep8_badge,
+            "doc_badge": doc_badge,
+            "message": message,
+        }))
+        return
+    
+    # === EN-TETE ===
+    filename = escape(report_data["filename"])
+    write(_REPORT_OPEN_TMPL.format_map({"filename": filename}))
+    write(_REPORT_CSS)
+    write(_REPORT_HEAD_TMPL.format_map({
+        "filename": filename,
+        "date": report_data["date"],
+        "before_color": before_color,
+        "after_color": after_color,
+        "imp_color": imp_color,
+        "imp_bg": imp_bg,
+        "score_before": score_before,
+        "score_after": score_after,
+        "imp_text": imp_text,
+        "lines": _og("lines", 0),
+        "code_lines": _og("code_lines", 0),
+        "n_functions": len(functions),
+        "n_classes": len(classes),
+        "avg_complexity": _og("avg_complexity", 0),
+        "doc_coverage": _og("doc_coverage", 0),
+        "pep8_badge": pep8_badge,
+        "doc_badge": doc_badge,
+    }))
+    
+    # === SECTION CLASSES (DOCUMENTATION) ===
+    if classes:
+        write(_SECTION_HEAD_TMPL.format_map({"title": "🏗️ Classes", "count": len(classes)}))
+        for cls in classes:
+            write(_render_class_card_head(cls))
+            writelines(map(_render_method_item, cls.get("methods", [])))
+            write(_CLASS_CARD_END)
+        write(_SECTION_END)
+    
+    # === SECTION FONCTIONS (DOCUMENTATION) ===
+    if functions:
+        write(_SECTION_HEAD_TMPL.format_map({"title": "⚡ Fonctions", "count": len(functions)}))
+        write(_FUNC_TABLE_HEAD)
+        writelines(map(_render_func_row, functions))
+        write(_TABLE_SECTION_END)
+    
+    # === SECTION IMPORTS ===
+    if imports:
+        write(_SECTION_HEAD_TMPL.format_map({"title": "📦 Imports", "count": len(imports)}))
+        write(_IMPORT_TABLE_HEAD)
+        writelines(map(_render_import_row, imports))
+        write(_TABLE_SECTION_END)
+    
+    # === SECTION VARIABLES ===
+    if variables or constants:
+        write(_SECTION_HEAD_TMPL.format_map({"title": "📊 Variables Globales", "count": len(variables) + len(constants)}))
+        write('<div class="vars-grid">')
+        writelines(map(_render_const_item, constants))
+        writelines(_render_var_item(v) for v in variables if not v.get("is_constant"))
+        write('</div>' + _SECTION_END)
+    
+    # === SECTION PROFILING ===
+    if has_profile:
+        # Top 15 par temps cumule, sans supposer la liste deja triee
+        profile_funcs = heapq.nlargest(15, profile["functions"], key=_GET_CUMTIME)
+        total_time = profile.get("total_time", 0.001)
+        inv_total = 100.0 / total_time if total_time > 0 else 0.0
+        
+        write(_SECTION_HEAD_TMPL.format_map({"title": "⏱️ Profiling", "count": f"{total_time * 1000:.2f}ms total"}))
+        write(_PROFILE_TABLE_HEAD)
+        writelines(_render_profile_row(pf, inv_total) for pf in profile_funcs)
+        write(_TABLE_SECTION_END)
+    
+    # === SECTION PROBLEMES ===
+    if style_issues:
+        write(_SECTION_HEAD_TMPL.format_map({"title": "⚠️ Problemes de Style", "count": len(style_issues)}))
+        writelines(_ISSUE_ITEM_TMPL.format_map({"issue": escape(issue)}) for issue in style_issues[:25])
+        if len(style_issues) > 25:
+            write(f'<p class="more">... et {len(style_issues) - 25} autres problemes</p>')
+        write(_SECTION_END)
+    
+    # === PIED DE PAGE ===
+    write(_REPORT_FOOTER)
+
+
+def generate_html_report(report_data: dict) -> str:
+    """
+    Genere le rapport HTML unifie et le retourne sous forme de chaine.
+    Pour les gros rapports, preferer write_html_report vers un fichier.
+    """
+    buf = io.StringIO()
+    write_html_report(report_data, buf)
+    return buf.getvalue()
+
+
+def generate_html_report_bytes(report_data: dict) -> bytes:
+    """
+    Genere le rapport HTML unifie directement encode en UTF-8, sans passer
+    par une chaine complete intermediaire (moitie moins de memoire en pointe).
+    """
+    out = io.TextIOWrapper(io.BytesIO(), encoding="utf-8", newline="")
+    write_html_report(report_data, out)
+    out.flush()
+    return out.buffer.getvalue()
+
+
+def generate_html_report_to(path, report_data: dict, bufsize: int = 1 << 20) -> None:
+    """Ecrit le rapport HTML unifie dans le fichier `path` via un tampon de `bufsize` octets."""
+    with open(path, "w", encoding="utf-8", buffering=bufsize) as f:
+        write_html_report(report_data, f)
+
+
+def _one_file(args: tuple, report_date: str = None) -> tuple:
+    """Travail d'un processus: donnees du rapport puis HTML pour un fichier."""
+    report_data = generate_report_data(*args, report_date=report_date)
+    return report_data, generate_html_report(report_data)
+
+
+def generate_reports_parallel(files, max_workers: int = None) -> list:
+    """
+    Genere les rapports de plusieurs fichiers dans un pool de processus.
+    
+    Args:
+        files: Tuples d'arguments de generate_report_data, par ex.
+            (filepath, original_code, corrected_code[, has_docstrings[, profile_data]])
+        max_workers: Nombre de processus (par defaut: nombre de coeurs)
+        
+    Returns:
+        Liste de (report_data, html) dans l'ordre de `files`
+    """
+    worker = partial(_one_file, report_date=report_now())
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+        return list(executor.map(worker, files, chunksize=4))
+
+
+def write_global_report(files_data: list, job_id: str, out, report_date: str = None) -> None:
+    """Ecrit le rapport global pour tous les fichiers dans `out`."""
+    
+    total_files = len(files_data)
+    if total_files == 0:
+        out.write("<html><body>Aucun fichier</body></html>")
+        return
+    
+    # Agregats calcules en un seul passage
+    total_functions = total_classes = total_score = total_improvement = 0
+    for f in files_data:
+        total_functions += len(f["functions"])
+        total_classes += len(f["classes"])
+        total_score += f["score"]
+        total_improvement += f["improvement"]
+    avg_score = total_score // total_files
+    avg_improvement = total_improvement // total_files
+    
+    current_date = report_date or report_now()
+    
+    out.write(_GLOBAL_OPEN_TMPL.format_map({"job_id": escape(job_id)}))
+    out.write(_GLOBAL_CSS)
+    out.write(_GLOBAL_HEAD_TMPL.format_map({
+        "job_id": escape(job_id),
+        "date": current_date,
+        "avg_score": avg_score,
+        "avg_improvement": avg_improvement,
+        "total_files": total_files,
+        "total_functions": total_functions,
+        "total_classes": total_classes,
+    }))
+    
+    out.writelines(map(_render_file_row, files_data))
+    
+    out.write(_GLOBAL_FOOTER)
+
+
+def generate_global_report(files_data: list, job_id: str, report_date: str = None) -> str:
+    """Genere un rapport global pour tous les fichiers."""
+    buf = io.StringIO()
+    write_global_report(files_data, job_id, buf, report_date)
+    return buf.getvalue()
+
+
+def generate_global_report_to(path, files_data: list, job_id: str,
+                              report_date: str = None, bufsize: int = 1 << 20) -> None:
+    """Ecrit le rapport global dans le fichier `path` via un tampon de `bufsize` octets."""
+    with open(path, "w", encoding="utf-8", buffering=bufsize) as f:
+        write_global_report(files_data, job_id, f, report_date)
\ No newline at end of file
@@ -3,29 +3,98 @@ Service LLM flexible : utilise l'API si configurée, sinon fallback sur Ollama l
 Supporte OpenRouter, OpenAI, et tout API compatible.
 """
 
+import asyncio
+import atexit
+import hashlib
+import json
 import os
-import subprocess
+import re
+from dataclasses import dataclass
+from functools import cache, lru_cache
+from types import MappingProxyType
+from typing import Union
 import httpx
 from dotenv import load_dotenv
 
-# Charger .env depuis le dossier parent (racine du projet)
 from pathlib import Path
 env_path = Path(__file__).parent.parent / ".env"
-load_dotenv(env_path)
 
-# Configuration
-LLM_API_URL = os.getenv("LLM_API_URL", "").strip()
-LLM_API_TOKEN = os.getenv("LLM_API_TOKEN", "").strip()
-LLM_MODEL = os.getenv("LLM_MODEL", "llama3.2:3b").strip()
+
+@dataclass(frozen=True)
+class LLMConfig:
+    """Configuration LLM figée, lue une seule fois depuis l'environnement et .env."""
+    api_url: str
+    api_token: str
+    model: str
+    batch_size: int
+    ollama_url: str
+    keep_alive: Union[str, int]  # Durée Ollama ("30m", "1h") ou entier (-1 = indéfini)
+    cache: bool
+
+
+@cache
+def _cfg() -> LLMConfig:
+    """Charge .env (racine du projet) puis construit la configuration, une seule fois."""
+    load_dotenv(env_path)
+    
+    keep_alive = os.getenv("LLM_KEEP_ALIVE", "30m").strip()
+    if keep_alive.lstrip("-").isdigit():
+        keep_alive = int(keep_alive)
+    
+    return LLMConfig(
+        api_url=os.getenv("LLM_API_URL", "").strip(),
+        api_token=os.getenv("LLM_API_TOKEN", "").strip(),
+        model=os.getenv("LLM_MODEL", "llama3.2:3b").strip(),
+        batch_size=max(1, int(os.getenv("LLM_BATCH_SIZE", "4"))),
+        ollama_url=os.getenv("OLLAMA_URL", "http://localhost:11434").strip().rstrip("/"),
+        keep_alive=keep_alive,
+        cache=os.getenv("LLM_CACHE", "1").strip() != "0",
+    )
+
+
+# Configuration (alias en globales pour les chemins d'appel)
+_CFG = _cfg()
+LLM_API_URL = _CFG.api_url
+LLM_API_TOKEN = _CFG.api_token
+LLM_MODEL = _CFG.model
+LLM_BATCH_SIZE = _CFG.batch_size
+OLLAMA_URL = _CFG.ollama_url
+LLM_KEEP_ALIVE = _CFG.keep_alive
+LLM_CACHE = _CFG.cache
+
+# Le choix du backend découle de la configuration figée
+_IS_API = bool(LLM_API_URL and LLM_API_TOKEN)
+
+# Cache des réponses : <racine>/.cache/llm/<sha256>.json, plus un LRU en mémoire
+# pour les prompts de moins de 1 Mo
+CACHE_DIR = Path(__file__).parent.parent / ".cache" / "llm"
+_LRU_MAX_PROMPT = 1 << 20
+
+# Délimiteurs des prompts regroupés dans une seule requête (call_api_batched)
+_BATCH_MARK = "---FILE {}---"
+_BATCH_SPLIT_RE = re.compile(r"^---FILE (\d+)---[ \t]*$", re.MULTILINE)
+
+# HTTP/2 seulement si le paquet optionnel h2 est installé
+try:
+    import h2  # noqa: F401
+    _HTTP2 = True
+except ImportError:
+    _HTTP2 = False
+
+# Client HTTP partagé : connexions keep-alive réutilisées entre les appels
+_HTTP_TIMEOUT = httpx.Timeout(180.0, connect=10.0)
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=16, max_connections=32, keepalive_expiry=90.0)
+_HTTP_CLIENT = httpx.Client(timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS, http2=_HTTP2)
+atexit.register(_HTTP_CLIENT.close)
 
 
 def is_api_configured() -> bool:
     """Vérifie si l'API externe est configurée."""
-    return bool(LLM_API_URL and LLM_API_TOKEN)
+    return _IS_API
 
 
-def call_api(prompt: str) -> str:
-    """Appelle l'API LLM externe (compatible OpenAI/OpenRouter)."""
+def _build_api_request(prompt: str) -> tuple:
+    """Construit (headers, payload) d'un appel à l'API LLM externe."""
     
     # Headers de base
     headers = {
@@ -50,60 +119,281 @@ def call_api(prompt: str) -> str:
         "temperature": 0.2,
         "max_tokens": 8192
     }
+    return headers, payload
+
+
+def _parse_api_response(response: httpx.Response) -> str:
+    """Vérifie le statut et extrait le contenu de la réponse de l'API."""
+    
+    # Debug
+    print(f"[LLM] Status: {response.status_code}")
+    
+    if response.status_code != 200:
+        print(f"[LLM] Erreur: {response.text}")
+        raise RuntimeError(f"API Error {response.status_code}: {response.text}")
+    
+    data = response.json()
+    
+    # Extraire la réponse
+    if "choices" in data and len(data["choices"]) > 0:
+        content = data["choices"][0]["message"]["content"]
+        print(f"[LLM] Réponse reçue ({len(content)} chars)")
+        return content
+    else:
+        raise RuntimeError(f"Format de réponse inattendu: {data}")
+
+
+def call_api(prompt: str) -> str:
+    """Appelle l'API LLM externe (compatible OpenAI/OpenRouter)."""
+    headers, payload = _build_api_request(prompt)
     
     try:
         print(f"[LLM] Appel API: {LLM_API_URL}")
         print(f"[LLM] Modèle: {LLM_MODEL}")
         
-        with httpx.Client(timeout=180.0) as client:
-            response = client.post(LLM_API_URL, json=payload, headers=headers)
-            
-            # Debug
-            print(f"[LLM] Status: {response.status_code}")
-            
+        response = _HTTP_CLIENT.post(LLM_API_URL, json=payload, headers=headers)
+        return _parse_api_response(response)
+                
+    except httpx.TimeoutException:
+        raise RuntimeError("Timeout: l'API n'a pas répondu dans les 180 secondes")
+    except Exception as e:
+        raise RuntimeError(f"Erreur API LLM: {e}")
+
+
+def stream_api(prompt: str):
+    """Appelle l'API LLM externe en streaming (SSE) et produit les fragments de texte."""
+    headers, payload = _build_api_request(prompt)
+    payload["stream"] = True
+    
+    try:
+        print(f"[LLM] Appel API (streaming): {LLM_API_URL}")
+        print(f"[LLM] Modèle: {LLM_MODEL}")
+        
+        with _HTTP_CLIENT.stream("POST", LLM_API_URL, json=payload, headers=headers) as response:
             if response.status_code != 200:
+                response.read()
                 print(f"[LLM] Erreur: {response.text}")
                 raise RuntimeError(f"API Error {response.status_code}: {response.text}")
             
-            data = response.json()
-            
-            # Extraire la réponse
-            if "choices" in data and len(data["choices"]) > 0:
-                content = data["choices"][0]["message"]["content"]
-                print(f"[LLM] Réponse reçue ({len(content)} chars)")
-                return content
-            else:
-                raise RuntimeError(f"Format de réponse inattendu: {data}")
+            # Trames SSE "data: {...}", terminées par "data: [DONE]"
+            done = received = False
+            for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    done = True
+                    break
+                chunk = json.loads(data)
+                # Erreur signalée en cours de flux : {"error": {...}}
+                if "error" in chunk:
+                    raise RuntimeError(f"Erreur API LLM: {chunk['error']}")
+                choices = chunk.get("choices")
+                if choices:
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        received = True
+                        yield content
+            if not (done or received):
+                raise RuntimeError("Format de réponse inattendu: flux terminé sans contenu")
                 
+    except httpx.TimeoutException:
+        raise RuntimeError("Timeout: l'API n'a pas répondu dans les 180 secondes")
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise RuntimeError(f"Erreur API LLM: {e}")
+
+
+def _split_batched_response(text: str, count: int):
+    """Découpe une réponse groupée par délimiteurs; None si une section manque."""
+    parts = _BATCH_SPLIT_RE.split(text)
+    sections = {}
+    for i in range(1, len(parts) - 1, 2):
+        sections[int(parts[i])] = parts[i + 1].strip()
+    if any(k not in sections for k in range(1, count + 1)):
+        return None
+    return [sections[k] for k in range(1, count + 1)]
+
+
+def call_api_batched(prompts: list) -> list:
+    """
+    Envoie les prompts par groupes de LLM_BATCH_SIZE dans un seul message,
+    séparés par des délimiteurs ---FILE k---, puis redécoupe la réponse.
+    
+    Passe par l'API externe si elle est configurée, sinon par Ollama.
+    Si le modèle ne respecte pas les délimiteurs, le groupe est renvoyé
+    prompt par prompt.
+    
+    Args:
+        prompts: Les prompts à envoyer au LLM
+        
+    Returns:
+        Les réponses, dans l'ordre des prompts
+    """
+    call = call_api if _IS_API else call_ollama
+    results = []
+    for start in range(0, len(prompts), LLM_BATCH_SIZE):
+        group = prompts[start:start + LLM_BATCH_SIZE]
+        if len(group) == 1:
+            results.append(call(group[0]))
+            continue
+        
+        packed = [
+            f"Traite indépendamment les {len(group)} sections suivantes. "
+            f"Réponds avec {len(group)} sections, chacune précédée de sa ligne "
+            f"de délimitation identique ({_BATCH_MARK.format(1)}, {_BATCH_MARK.format(2)}, ...)."
+        ]
+        for k, prompt in enumerate(group, 1):
+            packed.append(f"{_BATCH_MARK.format(k)}\n{prompt}")
+        
+        sections = _split_batched_response(call("\n\n".join(packed)), len(group))
+        if sections is None:
+            print("[LLM] Réponse groupée mal délimitée, envoi prompt par prompt")
+            sections = [call(p) for p in group]
+        results.extend(sections)
+    return results
+
+
+async def call_api_async(prompt: str, client: httpx.AsyncClient) -> str:
+    """Version asynchrone de call_api, sur un client partagé par le lot."""
+    headers, payload = _build_api_request(prompt)
+    
+    try:
+        response = await client.post(LLM_API_URL, json=payload, headers=headers)
+        return _parse_api_response(response)
     except httpx.TimeoutException:
         raise RuntimeError("Timeout: l'API n'a pas répondu dans les 180 secondes")
     except Exception as e:
         raise RuntimeError(f"Erreur API LLM: {e}")
 
 
+def _build_ollama_payload(prompt: str, stream: bool) -> dict:
+    """Corps d'une requête /api/generate (le modèle reste chargé LLM_KEEP_ALIVE)."""
+    return {
+        "model": LLM_MODEL,
+        "prompt": prompt,
+        "stream": stream,
+        "keep_alive": LLM_KEEP_ALIVE,
+        "options": {"temperature": 0.2, "num_predict": 8192}
+    }
+
+
+def warmup_ollama() -> bool:
+    """
+    Charge le modèle dans Ollama sans rien générer, pour que le premier
+    vrai prompt n'attende pas le chargement. Sans effet en mode API.
+    
+    Returns:
+        True si le modèle est chargé
+    """
+    if _IS_API:
+        return False
+    try:
+        response = _HTTP_CLIENT.post(
+            f"{OLLAMA_URL}/api/generate",
+            json={"model": LLM_MODEL, "keep_alive": LLM_KEEP_ALIVE},
+            timeout=300.0
+        )
+        print(f"[LLM] Préchargement Ollama {LLM_MODEL}: {response.status_code}")
+        return response.status_code == 200
+    except httpx.HTTPError as e:
+        print(f"[LLM] Préchargement Ollama impossible: {e}")
+        return False
+
+
 def call_ollama(prompt: str) -> str:
-    """Appelle Ollama en local."""
+    """Appelle le serveur Ollama local (API HTTP, modèle gardé en mémoire)."""
+    payload = _build_ollama_payload(prompt, stream=False)
+    
     try:
         print(f"[LLM] Appel Ollama local: {LLM_MODEL}")
         
-        result = subprocess.run(
-            ["ollama", "run", LLM_MODEL],
-            input=prompt,
-            text=True,
-            capture_output=True,
-            check=True,
-            timeout=300
-        )
-        return result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        raise RuntimeError(f"Erreur Ollama: {e.stderr}")
-    except FileNotFoundError:
-        raise RuntimeError("Ollama n'est pas installé. Installez-le ou configurez une API externe dans .env")
+        response = _HTTP_CLIENT.post(f"{OLLAMA_URL}/api/generate", json=payload, timeout=300.0)
+        if response.status_code != 200:
+            raise RuntimeError(f"Erreur Ollama: {response.text}")
+        return response.json()["response"].strip()
+    except httpx.ConnectError:
+        raise RuntimeError(f"Ollama ne répond pas sur {OLLAMA_URL}. Lancez `ollama serve` ou configurez une API externe dans .env")
+    except httpx.TimeoutException:
+        raise RuntimeError("Timeout: Ollama n'a pas répondu dans les 300 secondes")
+
+
+def stream_ollama(prompt: str):
+    """Appelle le serveur Ollama local en streaming (NDJSON) et produit les fragments de texte."""
+    payload = _build_ollama_payload(prompt, stream=True)
+    
+    try:
+        print(f"[LLM] Appel Ollama local (streaming): {LLM_MODEL}")
+        
+        with _HTTP_CLIENT.stream("POST", f"{OLLAMA_URL}/api/generate", json=payload, timeout=300.0) as response:
+            if response.status_code != 200:
+                response.read()
+                raise RuntimeError(f"Erreur Ollama: {response.text}")
+            done = received = False
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                # Erreur signalée en cours de flux : {"error": "..."}
+                if "error" in chunk:
+                    raise RuntimeError(f"Erreur Ollama: {chunk['error']}")
+                if chunk.get("response"):
+                    received = True
+                    yield chunk["response"]
+                if chunk.get("done"):
+                    done = True
+                    break
+            if not (done or received):
+                raise RuntimeError("Erreur Ollama: flux terminé sans réponse")
+    except httpx.ConnectError:
+        raise RuntimeError(f"Ollama ne répond pas sur {OLLAMA_URL}. Lancez `ollama serve` ou configurez une API externe dans .env")
+    except httpx.TimeoutException:
+        raise RuntimeError("Timeout: Ollama n'a pas répondu dans les 300 secondes")
+
+
+def _cache_key(prompt: str) -> str:
+    """Clé du cache : SHA-256 du modèle et du prompt."""
+    return hashlib.sha256((LLM_MODEL + "\x00" + prompt).encode("utf-8")).hexdigest()
+
+
+def _generate_cached(prompt: str) -> str:
+    """generate() avec lecture/écriture du cache disque."""
+    path = CACHE_DIR / f"{_cache_key(prompt)}.json"
+    try:
+        with open(path, encoding="utf-8") as f:
+            response = json.load(f)["response"]
+        # Entrée vide (écrite par une version antérieure) : ignorée
+        if isinstance(response, str) and response.strip():
+            print("[LLM] Réponse lue depuis le cache")
+            return response
+    except (OSError, ValueError, KeyError):
+        pass
+    
+    response = _generate_uncached(prompt)
+    # Une réponse vide ne doit être gardée ni sur disque ni par lru_cache
+    if not response.strip():
+        raise RuntimeError("Réponse vide du LLM (non mise en cache)")
+    
+    # Écriture atomique : un fichier partiel n'est jamais lu comme entrée du cache
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"model": LLM_MODEL, "response": response}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[LLM] Cache non écrit: {e}")
+    return response
+
+
+_generate_lru = lru_cache(maxsize=512)(_generate_cached)
 
 
 def generate(prompt: str) -> str:
     """
     Point d'entrée principal : utilise l'API si configurée, sinon Ollama.
+    Les réponses sont mises en cache (désactivable avec LLM_CACHE=0).
     
     Args:
         prompt: Le prompt à envoyer au LLM
@@ -111,17 +401,74 @@ def generate(prompt: str) -> str:
     Returns:
         La réponse du LLM
     """
-    if is_api_configured():
+    if not LLM_CACHE:
+        return _generate_uncached(prompt)
+    if len(prompt) <= _LRU_MAX_PROMPT:
+        return _generate_lru(prompt)
+    return _generate_cached(prompt)
+
+
+def generate_stream(prompt: str):
+    """
+    Comme generate, mais produit la réponse au fil de l'eau (sans cache).
+    
+    Args:
+        prompt: Le prompt à envoyer au LLM
+        
+    Yields:
+        Les fragments de texte de la réponse, dans l'ordre
+    """
+    if _IS_API:
         print("[LLM] Mode: API externe")
-        return call_api(prompt)
+        return stream_api(prompt)
     else:
         print("[LLM] Mode: Ollama local")
-        return call_ollama(prompt)
+        return stream_ollama(prompt)
+
+
+def _generate_uncached(prompt: str) -> str:
+    """Appel effectif du backend LLM, sans cache."""
+    response = "".join(generate_stream(prompt))
+    print(f"[LLM] Réponse reçue ({len(response)} chars)")
+    return response
+
+
+async def generate_many(prompts: list, concurrency: int = 8) -> list:
+    """
+    Envoie plusieurs prompts en parallèle (au plus `concurrency` à la fois).
+    
+    Args:
+        prompts: Les prompts à envoyer au LLM
+        concurrency: Nombre maximal de requêtes simultanées
+        
+    Returns:
+        Les réponses, dans l'ordre des prompts
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    if not _IS_API:
+        # Ollama local : appels bloquants déportés dans des threads
+        async def bounded_ollama(prompt):
+            async with semaphore:
+                return await asyncio.to_thread(call_ollama, prompt)
+        return await asyncio.gather(*[bounded_ollama(p) for p in prompts])
+    
+    print(f"[LLM] Lot de {len(prompts)} prompts vers {LLM_API_URL} (concurrence {concurrency})")
+    async with httpx.AsyncClient(timeout=_HTTP_TIMEOUT, limits=_HTTP_LIMITS, http2=_HTTP2) as client:
+        async def bounded(prompt):
+            async with semaphore:
+                return await call_api_async(prompt, client)
+        return await asyncio.gather(*[bounded(p) for p in prompts])
 
 
-def get_backend_info() -> dict:
-    """Retourne les infos sur le backend LLM utilisé."""
-    if is_api_configured():
+def generate_batch(prompts: list, concurrency: int = 8) -> list:
+    """Wrapper synchrone de generate_many (à appeler hors d'une boucle asyncio)."""
+    return asyncio.run(generate_many(prompts, concurrency))
+
+
+def _build_backend_info() -> dict:
+    """Construit les infos sur le backend LLM utilisé."""
+    if _IS_API:
         # Masquer le token
         masked_token = LLM_API_TOKEN[:10] + "..." if len(LLM_API_TOKEN) > 10 else "***"
         return {
@@ -133,4 +480,12 @@ def get_backend_info() -> dict:
     return {
         "backend": "ollama",
         "model": LLM_MODEL
-    }
\ No newline at end of file
+    }
+
+
+_BACKEND_INFO = MappingProxyType(_build_backend_info())
+
+
+def get_backend_info() -> MappingProxyType:
+    """Retourne les infos (en lecture seule) sur le backend LLM utilisé."""
+    return _BACKEND_INFO
\ No newline at end of file
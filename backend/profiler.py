@@ -1,167 +1,74 @@
 """
 Module de profiling du code Python.
-Utilise cProfile pour analyser les temps d'execution.
+Utilise cProfile pour analyser les temps d'execution, ou un echantillonnage
+de la pile (mode "sampling") pour les scripts lourds.
 """
 
 import cProfile
+import json
 import pstats
 import io
+import re
+import string
+import subprocess
 import sys
+import sysconfig
+import threading
+import time
 import tempfile
 import os
-from pathlib import Path
+from html import escape
 
 
-def profile_code(code: str, filename: str = "script.py") -> dict:
-    """
-    Profile le code Python et retourne les statistiques.
-    
-    Args:
-        code: Code Python a profiler
-        filename: Nom du fichier pour les traces
-        
-    Returns:
-        Dictionnaire avec les stats de profiling
-    """
-    # Creer un profiler
-    profiler = cProfile.Profile()
-    
-    # Preparer l'environnement d'execution
-    exec_globals = {
-        '__name__': '__main__',
-        '__file__': filename,
-    }
-    
-    # Capturer stdout/stderr
-    old_stdout = sys.stdout
-    old_stderr = sys.stderr
-    sys.stdout = io.StringIO()
-    sys.stderr = io.StringIO()
-    
-    error = None
-    
-    try:
-        # Compiler le code
-        compiled = compile(code, filename, 'exec')
-        
-        # Profiler l'execution
-        profiler.enable()
-        exec(compiled, exec_globals)
-        profiler.disable()
-        
-    except Exception as e:
-        error = str(e)
-    finally:
-        # Restaurer stdout/stderr
-        stdout_output = sys.stdout.getvalue()
-        stderr_output = sys.stderr.getvalue()
-        sys.stdout = old_stdout
-        sys.stderr = old_stderr
-    
-    # Extraire les statistiques
-    stats_stream = io.StringIO()
-    stats = pstats.Stats(profiler, stream=stats_stream)
-    stats.sort_stats('cumulative')
-    stats.print_stats(50)  # Top 50 fonctions
-    
-    # Parser les stats
-    functions_stats = extract_function_stats(profiler)
-    
-    # Calculer les totaux
-    total_time = sum(f['cumtime'] for f in functions_stats)
-    total_calls = sum(f['ncalls'] for f in functions_stats)
-    
-    return {
-        "success": error is None,
-        "error": error,
-        "stdout": stdout_output[:1000] if stdout_output else None,
-        "stderr": stderr_output[:500] if stderr_output else None,
-        "total_time": round(total_time, 6),
-        "total_calls": total_calls,
-        "functions": functions_stats[:30],  # Top 30
-        "raw_stats": stats_stream.getvalue()
-    }
+# Fichiers internes exclus des stats: <frozen ...>, <string>, importlib
+_SKIP_RE = re.compile(r"<|importlib")
+# Encodages et fonctions de chemins utilisees par l'interpreteur: ancres sur
+# la stdlib pour ne pas masquer un fichier utilisateur du meme nom
+_STDLIB_SKIP_RE = re.compile(
+    "(?:%s)" % "|".join(sorted({re.escape(sysconfig.get_paths()[k]) for k in ("stdlib", "platstdlib")}))
+    + r"[/\\](?:encodings[/\\]|(?:codecs|genericpath)\.py$)"
+)
 
+# Limites par defaut de profile_code_isolated
+ISOLATED_TIMEOUT = 60
+ISOLATED_MEMORY_LIMIT = 512 << 20
 
-def extract_function_stats(profiler) -> list:
-    """
-    Extrait les statistiques par fonction depuis le profiler.
-    """
-    stats = pstats.Stats(profiler)
-    
-    functions = []
-    
-    for key, value in stats.stats.items():
-        filename, line, func_name = key
-        ncalls, totcalls, tottime, cumtime, callers = value
-        
-        # Filtrer les fonctions internes Python
-        if '<' in filename or 'importlib' in filename:
-            continue
-        
-        # Simplifier le nom du fichier
-        if filename:
-            filename = Path(filename).name
-        
-        functions.append({
-            "name": func_name,
-            "filename": filename,
-            "line": line,
-            "ncalls": ncalls,
-            "totcalls": totcalls,
-            "tottime": round(tottime, 6),
-            "cumtime": round(cumtime, 6),
-            "percall": round(cumtime / ncalls, 6) if ncalls > 0 else 0
-        })
-    
-    # Trier par temps cumulatif
-    functions.sort(key=lambda x: x['cumtime'], reverse=True)
-    
-    return functions
+# Script du sous-processus: pose ses limites memoire/CPU (POSIX uniquement),
+# profile le code lu sur stdin et ecrit le resultat en JSON dans un fichier
+# (stdout reste libre pour le code utilisateur)
+_HARNESS = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+from profiler import profile_code
+try:
+    import resource
+    resource.setrlimit(resource.RLIMIT_AS, (int(sys.argv[6]),) * 2)
+    resource.setrlimit(resource.RLIMIT_CPU, (int(sys.argv[7]),) * 2)
+except ImportError:
+    pass
+result = profile_code(sys.stdin.read(), sys.argv[2], include_raw=sys.argv[3] == "1", mode=sys.argv[4])
+with open(sys.argv[5], "w", encoding="utf-8") as f:
+    json.dump(result, f)
+"""
 
 
-def generate_profile_html(profile_data: dict, filename: str) -> str:
-    """
-    Genere un rapport HTML du profiling.
-    """
-    functions = profile_data.get("functions", [])
-    total_time = profile_data.get("total_time", 0)
-    
-    # Generer les barres de temps
-    rows_html = ""
-    max_time = functions[0]["cumtime"] if functions else 1
-    
-    for func in functions:
-        pct = (func["cumtime"] / total_time * 100) if total_time > 0 else 0
-        bar_width = (func["cumtime"] / max_time * 100) if max_time > 0 else 0
-        
-        color = "#22c55e" if pct < 10 else "#f59e0b" if pct < 30 else "#ef4444"
-        
-        rows_html += """
+# === GABARITS HTML ===
+_ROW_TMPL = """
         <tr>
-            <td><code>""" + func["name"] + """</code></td>
-            <td>""" + str(func["ncalls"]) + """</td>
-            <td>""" + str(func["tottime"]) + """s</td>
-            <td>""" + str(func["cumtime"]) + """s</td>
+            <td><code>{name}</code></td>
+            <td>{ncalls}</td>
+            <td>{tottime}s</td>
+            <td>{cumtime}s</td>
             <td>
                 <div class="bar-container">
-                    <div class="bar" style="width:""" + str(bar_width) + """%;background:""" + color + """"></div>
-                    <span>""" + str(round(pct, 1)) + """%</span>
+                    <div class="bar" style="width:{bar}%;background:{color}"></div>
+                    <span>{pct}%</span>
                 </div>
             </td>
         </tr>
         """
-    
-    error_html = ""
-    if profile_data.get("error"):
-        error_html = '<div class="error-box">Erreur: ' + profile_data["error"] + '</div>'
-    
-    return """<!DOCTYPE html>
-<html lang="fr">
-<head>
-    <meta charset="UTF-8">
-    <title>Profiling - """ + filename + """</title>
-    <style>
+
+_PROFILE_STYLE = """    <style>
         * { margin: 0; padding: 0; box-sizing: border-box; }
         body {
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
@@ -249,31 +156,39 @@ def generate_profile_html(profile_data: dict, filename: str) -> str:
             margin-bottom: 16px;
         }
     </style>
-</head>
+"""
+
+# Page complete: les valeurs $... sont echappees par generate_profile_html
+_HTML_TEMPLATE = string.Template("""<!DOCTYPE html>
+<html lang="fr">
+<head>
+    <meta charset="UTF-8">
+    <title>Profiling - $filename</title>
+""" + _PROFILE_STYLE + """</head>
 <body>
     <div class="container">
         <div class="header">
             <h1>Profiling du Code</h1>
-            <p>""" + filename + """</p>
+            <p>$filename</p>
         </div>
         
         <div class="stats">
             <div class="stat">
-                <div class="stat-value">""" + str(round(total_time * 1000, 2)) + """ms</div>
+                <div class="stat-value">${total_ms}ms</div>
                 <div class="stat-label">Temps total</div>
             </div>
             <div class="stat">
-                <div class="stat-value">""" + str(profile_data.get("total_calls", 0)) + """</div>
+                <div class="stat-value">$total_calls</div>
                 <div class="stat-label">Appels totaux</div>
             </div>
             <div class="stat">
-                <div class="stat-value">""" + str(len(functions)) + """</div>
+                <div class="stat-value">$nfuncs</div>
                 <div class="stat-label">Fonctions</div>
             </div>
         </div>
         
         <div class="content">
-            """ + error_html + """
+            $error
             <table>
                 <thead>
                     <tr>
@@ -284,12 +199,321 @@ def generate_profile_html(profile_data: dict, filename: str) -> str:
                         <th>% du total</th>
                     </tr>
                 </thead>
-                <tbody>""" + rows_html + """</tbody>
+                <tbody>$rows</tbody>
             </table>
         </div>
     </div>
 </body>
-</html>"""
+</html>""")
+
+
+def profile_code(code: str, filename: str = "script.py", include_raw: bool = False,
+                 mode: str = "deterministic", interval: float = 0.001) -> dict:
+    """
+    Profile le code Python et retourne les statistiques.
+    
+    Args:
+        code: Code Python a profiler
+        filename: Nom du fichier pour les traces
+        include_raw: Ajoute la sortie texte de pstats (top 50) dans "raw_stats"
+        mode: "deterministic" (cProfile, chaque appel est instrumente) ou
+            "sampling" (pile echantillonnee toutes les `interval` secondes,
+            surcout quasi nul; ncalls y compte les echantillons et
+            raw_stats reste vide)
+        interval: Periode d'echantillonnage en secondes (mode "sampling")
+        
+    Returns:
+        Dictionnaire avec les stats de profiling
+    """
+    if mode not in ("deterministic", "sampling"):
+        raise ValueError(f"Mode de profiling inconnu: {mode}")
+    sampling = mode == "sampling"
+    
+    # Creer un profiler
+    profiler = None if sampling else cProfile.Profile()
+    sampler = None
+    
+    # Preparer l'environnement d'execution
+    exec_globals = {
+        '__name__': '__main__',
+        '__file__': filename,
+    }
+    
+    # Capturer stdout/stderr
+    old_stdout = sys.stdout
+    old_stderr = sys.stderr
+    sys.stdout = io.StringIO()
+    sys.stderr = io.StringIO()
+    
+    error = None
+    
+    try:
+        # Compiler le code
+        compiled = compile(code, filename, 'exec')
+        
+        # Profiler l'execution
+        if sampling:
+            sampler = _StackSampler(sys._getframe(), compiled, interval)
+            sampler.start()
+            try:
+                exec(compiled, exec_globals)
+            finally:
+                sampler.stop()
+        else:
+            profiler.enable()
+            exec(compiled, exec_globals)
+            profiler.disable()
+        
+    except Exception as e:
+        error = str(e)
+    finally:
+        # Restaurer stdout/stderr
+        stdout_output = sys.stdout.getvalue()
+        stderr_output = sys.stderr.getvalue()
+        sys.stdout = old_stdout
+        sys.stderr = old_stderr
+    
+    # Extraire les statistiques (un seul objet Stats pour le texte et le parsing)
+    raw_stats = None
+    if sampling:
+        table = sampler.table() if sampler else {}
+    else:
+        if include_raw:
+            stats_stream = io.StringIO()
+            stats = pstats.Stats(profiler, stream=stats_stream)
+            stats.sort_stats('cumulative')
+            stats.print_stats(50)  # Top 50 fonctions
+            raw_stats = stats_stream.getvalue()
+        else:
+            stats = pstats.Stats(profiler)
+        table = stats.stats
+    
+    # Parser les stats (totaux calcules dans la meme passe)
+    functions_stats, total_time, total_calls = _table_function_stats(table)
+    
+    return {
+        "success": error is None,
+        "error": error,
+        "stdout": stdout_output[:1000] if stdout_output else None,
+        "stderr": stderr_output[:500] if stderr_output else None,
+        "total_time": round(total_time, 6),
+        "total_calls": total_calls,
+        "functions": functions_stats[:30],  # Top 30
+        "raw_stats": raw_stats
+    }
+
+
+def profile_code_isolated(code: str, filename: str = "script.py", include_raw: bool = False,
+                          mode: str = "deterministic", timeout: float = ISOLATED_TIMEOUT,
+                          memory_limit: int = ISOLATED_MEMORY_LIMIT) -> dict:
+    """
+    Comme profile_code, mais execute le code dans un sous-processus avec
+    limites de memoire (RLIMIT_AS) et de temps CPU, et un delai maximal:
+    un script qui plante ou consomme trop n'affecte pas le serveur.
+    
+    Returns:
+        Dictionnaire avec les stats de profiling (meme format que profile_code)
+    """
+    fd, result_path = tempfile.mkstemp(suffix=".json", prefix="profile_")
+    os.close(fd)
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-c", _HARNESS, os.path.dirname(os.path.abspath(__file__)),
+             filename, "1" if include_raw else "0", mode, result_path,
+             str(memory_limit), str(int(timeout) + 1)],
+            input=code,
+            text=True,
+            encoding="utf-8",
+            capture_output=True,
+            timeout=timeout
+        )
+        try:
+            with open(result_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            detail = proc.stderr.strip().splitlines()[-1:] or [f"code de sortie {proc.returncode}"]
+            return _failed_profile(f"Processus de profiling interrompu: {detail[0]}")
+    except subprocess.TimeoutExpired:
+        return _failed_profile(f"Timeout: le code n'a pas termine en {timeout} secondes")
+    finally:
+        os.unlink(result_path)
+
+
+def _failed_profile(error: str) -> dict:
+    """Resultat de profiling vide pour une execution qui n'a pas abouti."""
+    return {
+        "success": False,
+        "error": error,
+        "stdout": None,
+        "stderr": None,
+        "total_time": 0,
+        "total_calls": 0,
+        "functions": [],
+        "raw_stats": None
+    }
+
+
+def extract_function_stats(stats) -> list:
+    """
+    Extrait les statistiques par fonction depuis un pstats.Stats deja construit
+    (un cProfile.Profile est aussi accepte).
+    """
+    if not isinstance(stats, pstats.Stats):
+        stats = pstats.Stats(stats)
+    return _table_function_stats(stats.stats)[0]
+
+
+def _table_function_stats(table: dict) -> tuple:
+    """
+    Convertit une table au format pstats
+    {(fichier, ligne, nom): (ncalls, totcalls, tottime, cumtime, callers)}
+    en (fonctions triees par temps cumulatif, somme des cumtime, somme des ncalls).
+    """
+    functions = []
+    sum_cum = 0.0
+    sum_calls = 0
+    # Nom court par fichier (False = fichier filtre): les memes fichiers reviennent pour de nombreuses fonctions
+    basenames = {}
+    
+    for key, value in table.items():
+        filename, line, func_name = key
+        ncalls, totcalls, tottime, cumtime, callers = value
+        
+        name = basenames.get(filename)
+        if name is None:
+            # Filtrer les fonctions internes Python
+            if filename[:1] == "<" or _SKIP_RE.search(filename) or _STDLIB_SKIP_RE.match(filename):
+                name = False
+            elif "/" in filename or "\\" in filename:
+                # Simplifier le nom du fichier
+                name = filename.rsplit("/", 1)[-1].rsplit("\\", 1)[-1]
+            else:
+                name = filename  # Deja un nom court ("~", "script.py"...)
+            basenames[filename] = name
+        if name is False:
+            continue
+        filename = name
+        
+        cumtime_r = round(cumtime, 6)
+        sum_cum += cumtime_r
+        sum_calls += ncalls
+        functions.append({
+            "name": func_name,
+            "filename": filename,
+            "line": line,
+            "ncalls": ncalls,
+            "totcalls": totcalls,
+            "tottime": round(tottime, 6),
+            "cumtime": cumtime_r,
+            "percall": round(cumtime / ncalls, 6) if ncalls > 0 else 0
+        })
+    
+    # Trier par temps cumulatif
+    functions.sort(key=lambda x: x['cumtime'], reverse=True)
+    
+    return functions, sum_cum, sum_calls
+
+
+class _StackSampler:
+    """
+    Echantillonne la pile du thread courant depuis un thread secondaire.
+    Chaque echantillon ajoute le temps ecoule au temps propre de la fonction
+    en sommet de pile et au temps cumule de chaque fonction de la pile.
+    Seules les piles issues de `root_code` (le module execute) sont comptees.
+    """
+    
+    def __init__(self, base_frame, root_code, interval: float):
+        self._base = base_frame  # Les frames a partir de celle-ci ne sont pas comptees
+        self._root = root_code
+        self._interval = interval
+        self._old_switch = None
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._samples = {}
+        self._self_time = {}
+        self._cum_time = {}
+    
+    def start(self):
+        # Le thread d'echantillonnage doit pouvoir reprendre le GIL a chaque periode
+        self._old_switch = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._old_switch, self._interval))
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        sys.setswitchinterval(self._old_switch)
+    
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self._interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            code = None
+            while frame is not None and frame is not self._base:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            frame = None
+            if code is not self._root:
+                continue
+            
+            self._self_time[stack[0]] = self._self_time.get(stack[0], 0.0) + elapsed
+            for key in set(stack):  # Recursion: une fonction n'est comptee qu'une fois par pile
+                self._samples[key] = self._samples.get(key, 0) + 1
+                self._cum_time[key] = self._cum_time.get(key, 0.0) + elapsed
+    
+    def table(self) -> dict:
+        """Resultats au format de pstats.Stats.stats (ncalls = echantillons)."""
+        return {
+            key: (n, n, self._self_time.get(key, 0.0), self._cum_time[key], {})
+            for key, n in self._samples.items()
+        }
+
+
+def generate_profile_html(profile_data: dict, filename: str) -> str:
+    """
+    Genere un rapport HTML du profiling.
+    """
+    functions = profile_data.get("functions", [])
+    total_time = profile_data.get("total_time", 0)
+    
+    # Generer les barres de temps
+    max_time = functions[0]["cumtime"] if functions else 1
+    rows_html = "".join(_render_row(func, total_time, max_time) for func in functions)
+    
+    error_html = ""
+    if profile_data.get("error"):
+        error_html = '<div class="error-box">Erreur: ' + escape(profile_data["error"]) + '</div>'
+    
+    return _HTML_TEMPLATE.substitute(
+        filename=escape(filename),
+        total_ms=round(total_time * 1000, 2),
+        total_calls=profile_data.get("total_calls", 0),
+        nfuncs=len(functions),
+        error=error_html,
+        rows=rows_html
+    )
+
+
+def _render_row(func: dict, total_time: float, max_time: float) -> str:
+    """Ligne <tr> d'une fonction profilee."""
+    pct = (func["cumtime"] / total_time * 100) if total_time > 0 else 0
+    bar_width = (func["cumtime"] / max_time * 100) if max_time > 0 else 0
+    
+    return _ROW_TMPL.format_map({
+        "name": escape(func["name"]),
+        "ncalls": func["ncalls"],
+        "tottime": func["tottime"],
+        "cumtime": func["cumtime"],
+        "bar": bar_width,
+        "color": "#22c55e" if pct < 10 else "#f59e0b" if pct < 30 else "#ef4444",
+        "pct": round(pct, 1),
+    })
 
 
 def generate_snakeviz_data(profile_data: dict) -> dict:
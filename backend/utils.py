@@ -4,33 +4,66 @@ Fonctions utilitaires communes.
 
 import os
 import shutil
-from datetime import datetime
+import threading
+import time
+import uuid
 from pathlib import Path
 
 
+# O_BINARY : pas de conversion des fins de ligne par os.write sous Windows
+_WRITE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+
+
 def read_file(filepath: str) -> str:
     """Lit et retourne le contenu d'un fichier texte."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return f.read()
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    # Un seul décodage, puis fins de ligne normalisées comme en mode texte
+    text = data.decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
 
 
 def write_file(filepath: str, content: str):
     """Écrit du contenu dans un fichier (crée le dossier si besoin)."""
-    path = Path(filepath)
-    if path.parent and str(path.parent) != '.':
-        path.parent.mkdir(parents=True, exist_ok=True)
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(content)
+    parent = os.path.dirname(filepath)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    
+    data = memoryview(content.encode('utf-8'))
+    fd = os.open(filepath, _WRITE_FLAGS, 0o644)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
+def iter_python_files(folder: str):
+    """
+    Parcourt les fichiers .py d'un dossier (récursif) au fil de l'eau.
+    Même ordre que os.walk : fichiers d'un dossier, puis ses sous-dossiers.
+    """
+    stack = [folder]
+    while stack:
+        subdirs = []
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    # d_type fourni par scandir : pas de stat() par fichier
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.name.endswith(".py") and not entry.name.startswith("__"):
+                        yield entry.path
+        except OSError:
+            continue  # Dossier illisible : ignoré, comme os.walk
+        stack.extend(reversed(subdirs))
 
 
 def list_python_files(folder: str) -> list:
     """Renvoie la liste des fichiers .py dans un dossier (récursif)."""
-    python_files = []
-    for root, _, files in os.walk(folder):
-        for f in files:
-            if f.endswith(".py") and not f.startswith("__"):
-                python_files.append(os.path.join(root, f))
-    return python_files
+    return list(iter_python_files(folder))
 
 
 def ensure_dir(path: str):
@@ -38,16 +71,52 @@ def ensure_dir(path: str):
     Path(path).mkdir(parents=True, exist_ok=True)
 
 
+def remove_dir(path: str):
+    """
+    Supprime un dossier s'il existe, sans attendre : il est renommé puis
+    effacé par un thread en arrière-plan.
+    """
+    path = str(path).rstrip("/\\")
+    if not os.path.exists(path):
+        return
+    trashed = f"{path}.trash-{timestamp()}-{uuid.uuid4().hex[:8]}"
+    try:
+        os.replace(path, trashed)
+    except OSError:
+        # Renommage impossible (fichier verrouillé...) : suppression directe
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    threading.Thread(target=shutil.rmtree, args=(trashed, True), daemon=True).start()
+
+
+def purge_trash(folder: str):
+    """
+    Supprime en arrière-plan les dossiers '*.trash-*' laissés dans un dossier
+    par remove_dir (processus arrêté avant la fin de l'effacement).
+    """
+    try:
+        with os.scandir(folder) as entries:
+            trashed = [entry.path for entry in entries if ".trash-" in entry.name]
+    except OSError:
+        return  # Dossier absent ou illisible : rien à nettoyer
+    for path in trashed:
+        threading.Thread(target=shutil.rmtree, args=(path, True), daemon=True).start()
+
+
 def clean_dir(path: str):
-    """Vide un dossier s'il existe."""
-    if os.path.exists(path):
-        shutil.rmtree(path)
-    os.makedirs(path)
+    """Vide un dossier s'il existe (l'ancien contenu est supprimé en arrière-plan)."""
+    remove_dir(path)
+    os.makedirs(path, exist_ok=True)
 
 
 def timestamp() -> str:
     """Retourne un timestamp au format 'YYYYMMDD_HHMMSS'."""
-    return datetime.now().strftime("%Y%m%d_%H%M%S")
+    return time.strftime("%Y%m%d_%H%M%S")
+
+
+def timestamp_ns() -> str:
+    """Retourne un timestamp en nanosecondes (20 chiffres, triable), pour les appels en boucle."""
+    return f"{time.time_ns():020d}"
 
 
 def get_relative_path(filepath: str, base: str) -> str: